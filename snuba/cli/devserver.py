@@ -1,5 +1,111 @@
+from typing import Sequence, Tuple
+
 import click
 
+# Every daemon run by the devserver, as (name, command, args). The API comes
+# first since it is the only daemon run with --no-workers.
+_DAEMONS: Sequence[Tuple[str, str, Sequence[str]]] = (
+    ("api", "api", ()),
+    (
+        "transaction-consumer",
+        "consumer",
+        (
+            "--auto-offset-reset=latest",
+            "--log-level=debug",
+            "--storage=transactions",
+            "--consumer-group=transactions_group",
+            "--commit-log-topic=snuba-commit-log",
+        ),
+    ),
+    (
+        "sessions-consumer",
+        "consumer",
+        (
+            "--auto-offset-reset=latest",
+            "--log-level=debug",
+            "--storage=sessions_raw",
+            "--consumer-group=sessions_group",
+        ),
+    ),
+    (
+        "outcomes-consumer",
+        "consumer",
+        (
+            "--auto-offset-reset=latest",
+            "--log-level=debug",
+            "--storage=outcomes_raw",
+            "--consumer-group=outcomes_group",
+        ),
+    ),
+    (
+        "consumer",
+        "consumer",
+        ("--auto-offset-reset=latest", "--log-level=debug", "--storage=errors"),
+    ),
+    (
+        "replacer",
+        "replacer",
+        ("--auto-offset-reset=latest", "--log-level=debug", "--storage=errors"),
+    ),
+    (
+        "subscriptions-consumer-events",
+        "subscriptions",
+        (
+            "--auto-offset-reset=latest",
+            "--log-level=debug",
+            "--max-batch-size=1",
+            "--consumer-group=snuba-events-subscriptions-consumers",
+            "--dataset=events",
+            "--commit-log-topic=snuba-commit-log",
+            "--commit-log-group=snuba-consumers",
+            "--delay-seconds=1",
+            "--schedule-ttl=10",
+            "--max-query-workers=1",
+        ),
+    ),
+    (
+        "subscriptions-consumer-transactions",
+        "subscriptions",
+        (
+            "--auto-offset-reset=latest",
+            "--log-level=debug",
+            "--max-batch-size=1",
+            "--consumer-group=snuba-transactions-subscriptions-consumers",
+            "--dataset=transactions",
+            "--commit-log-topic=snuba-commit-log",
+            "--commit-log-group=transactions_group",
+            "--delay-seconds=1",
+            "--schedule-ttl=10",
+            "--max-query-workers=1",
+        ),
+    ),
+    (
+        "cdc-consumer",
+        "multistorage-consumer",
+        (
+            "--auto-offset-reset=latest",
+            "--log-level=debug",
+            "--storage=groupedmessages",
+            "--storage=groupassignees",
+            "--consumer-group=cdc_group",
+        ),
+    ),
+)
+
+
+def _run_command(command_name: str, args: Sequence[str]) -> int:
+    """
+    Runs a one-off ``snuba`` command in the current process, returning its
+    exit code instead of exiting.
+    """
+    from snuba.cli.run_daemons import invoke_command
+
+    try:
+        invoke_command(command_name, args)
+    except SystemExit as e:
+        return e.code
+    return 0
+
 
 @click.command()
 @click.option("--bootstrap/--no-bootstrap", default=True)
@@ -7,139 +113,54 @@ import click
 def devserver(*, bootstrap: bool, workers: bool) -> None:
     "Starts all Snuba processes for local development."
     import os
+    import shutil
     import sys
-    from subprocess import call, list2cmdline
-
-    from honcho.manager import Manager
 
     os.environ["PYTHONUNBUFFERED"] = "1"
 
+    # Resolve the executable once and exec it directly rather than going
+    # through a PATH lookup (or a shell) for every exec.
+    snuba_path = shutil.which("snuba")
+    if snuba_path is None:
+        raise click.ClickException("Could not find the snuba executable in PATH")
+
     if bootstrap:
-        cmd = ["snuba", "bootstrap", "--force", "--no-migrate"]
+        bootstrap_args = ["--force", "--no-migrate"]
         if not workers:
-            cmd.append("--no-kafka")
-        returncode = call(cmd)
+            bootstrap_args.append("--no-kafka")
+        returncode = _run_command("bootstrap", bootstrap_args)
         if returncode > 0:
             sys.exit(returncode)
 
         # Run migrations
-        returncode = call(["snuba", "migrations", "migrate", "--force"])
+        returncode = _run_command("migrations", ["migrate", "--force"])
         if returncode > 0:
             sys.exit(returncode)
 
-    daemons = [("api", ["snuba", "api"])]
-
     if not workers:
-        os.execvp(daemons[0][1][0], daemons[0][1])
+        _, command_name, args = _DAEMONS[0]
+        os.execv(snuba_path, ["snuba", command_name, *args])
 
-    daemons += [
-        (
-            "transaction-consumer",
-            [
-                "snuba",
-                "consumer",
-                "--auto-offset-reset=latest",
-                "--log-level=debug",
-                "--storage=transactions",
-                "--consumer-group=transactions_group",
-                "--commit-log-topic=snuba-commit-log",
-            ],
-        ),
-        (
-            "sessions-consumer",
-            [
-                "snuba",
-                "consumer",
-                "--auto-offset-reset=latest",
-                "--log-level=debug",
-                "--storage=sessions_raw",
-                "--consumer-group=sessions_group",
-            ],
-        ),
-        (
-            "outcomes-consumer",
-            [
-                "snuba",
-                "consumer",
-                "--auto-offset-reset=latest",
-                "--log-level=debug",
-                "--storage=outcomes_raw",
-                "--consumer-group=outcomes_group",
-            ],
-        ),
-        (
-            "consumer",
-            [
-                "snuba",
-                "consumer",
-                "--auto-offset-reset=latest",
-                "--log-level=debug",
-                "--storage=errors",
-            ],
-        ),
-        (
-            "replacer",
-            [
-                "snuba",
-                "replacer",
-                "--auto-offset-reset=latest",
-                "--log-level=debug",
-                "--storage=errors",
-            ],
-        ),
-        (
-            "subscriptions-consumer-events",
-            [
-                "snuba",
-                "subscriptions",
-                "--auto-offset-reset=latest",
-                "--log-level=debug",
-                "--max-batch-size=1",
-                "--consumer-group=snuba-events-subscriptions-consumers",
-                "--dataset=events",
-                "--commit-log-topic=snuba-commit-log",
-                "--commit-log-group=snuba-consumers",
-                "--delay-seconds=1",
-                "--schedule-ttl=10",
-                "--max-query-workers=1",
-            ],
-        ),
-        (
-            "subscriptions-consumer-transactions",
-            [
-                "snuba",
-                "subscriptions",
-                "--auto-offset-reset=latest",
-                "--log-level=debug",
-                "--max-batch-size=1",
-                "--consumer-group=snuba-transactions-subscriptions-consumers",
-                "--dataset=transactions",
-                "--commit-log-topic=snuba-commit-log",
-                "--commit-log-group=transactions_group",
-                "--delay-seconds=1",
-                "--schedule-ttl=10",
-                "--max-query-workers=1",
-            ],
-        ),
-        (
-            "cdc-consumer",
+    import json
+
+    # Feed the spec to run-daemons through its stdin rather than a file that
+    # would have to be cleaned up. The spec is far smaller than the pipe
+    # buffer, so it can be written in full before anything reads it.
+    read_fd, write_fd = os.pipe()
+    with os.fdopen(write_fd, "w") as spec:
+        json.dump(
             [
-                "snuba",
-                "multistorage-consumer",
-                "--auto-offset-reset=latest",
-                "--log-level=debug",
-                "--storage=groupedmessages",
-                "--storage=groupassignees",
-                "--consumer-group=cdc_group",
+                {"name": name, "kind": kind, "args": args}
+                for name, kind, args in _DAEMONS
             ],
-        ),
-    ]
-
-    manager = Manager()
-    for name, cmd in daemons:
-        manager.add_process(
-            name, list2cmdline(cmd), quiet=False,
+            spec,
         )
 
-    manager.loop()
-    sys.exit(manager.returncode)
+    # Target fd 0 itself since sys.stdin is None when stdin is closed, in
+    # which case the pipe may already have been given fd 0 (but not made
+    # inheritable, unlike the copy dup2 makes).
+    if read_fd != 0:
+        os.dup2(read_fd, 0)
+        os.close(read_fd)
+    os.set_inheritable(0, True)
+    os.execv(snuba_path, ["snuba", "run-daemons", "--spec=-"])
@@ -0,0 +1,209 @@
+import json
+import os
+import sys
+from datetime import datetime
+from multiprocessing.connection import Connection, wait
+from typing import Any, MutableMapping, Sequence, TextIO
+
+import click
+
+# Modules imported once by the forkserver so that every daemon forked from
+# it starts with them already loaded, rather than paying for a fresh
+# interpreter and a full import of the Snuba stack.
+FORKSERVER_PRELOAD = [
+    "snuba",
+    "snuba.cli",
+    "snuba.datasets.factory",
+    "arroyo",
+    "confluent_kafka",
+    "clickhouse_driver",
+]
+
+# Seconds the daemons are given to exit once terminated before they are
+# killed, the same grace period honcho used.
+SHUTDOWN_TIMEOUT = 5.0
+
+
+def get_command(command_name: str) -> click.Command:
+    """
+    Resolves a command of the ``snuba`` group by name. Commands are
+    resolved by name rather than passed around since click commands cannot
+    be pickled and sent to the forkserver.
+    """
+    from snuba.cli import main
+
+    command = main.commands.get(command_name)
+    if command is None:
+        raise click.ClickException(f"Unknown command {command_name!r}")
+
+    return command
+
+
+def invoke_command(command_name: str, args: Sequence[str]) -> None:
+    """
+    Runs ``snuba <command_name> <args>`` in the current process.
+    """
+    get_command(command_name).main(args=list(args), prog_name=f"snuba {command_name}")
+
+
+def _run_daemon(command_name: str, args: Sequence[str], output: Connection) -> None:
+    """
+    Runs a daemon with both its stdout and stderr sent to ``output``, down
+    to the file descriptor level so that the output of native libraries is
+    included as well.
+    """
+    os.dup2(output.fileno(), 1)
+    os.dup2(output.fileno(), 2)
+    output.close()
+    invoke_command(command_name, args)
+
+
+class _DaemonOutput:
+    """
+    Prints the output of every daemon line by line, each line prefixed with
+    the time and the name of the daemon it comes from, the way honcho did.
+    """
+
+    def __init__(self, width: int) -> None:
+        self.__width = width
+        self.__names: MutableMapping[Connection, str] = {}
+        self.__buffers: MutableMapping[Connection, bytes] = {}
+
+    @property
+    def readers(self) -> Sequence[Connection]:
+        return [*self.__names]
+
+    def add(self, name: str, reader: Connection) -> None:
+        self.__names[reader] = name
+        self.__buffers[reader] = b""
+
+    def read(self, ready: Sequence[Any]) -> None:
+        """
+        Prints the complete lines available from the readers in ``ready``,
+        anything else in it is ignored.
+        """
+        for reader in self.readers:
+            if reader not in ready:
+                continue
+            data = os.read(reader.fileno(), 65536)
+            if not data:
+                self.__close(reader)
+                continue
+            buffer = self.__buffers[reader] + data
+            *lines, self.__buffers[reader] = buffer.split(b"\n")
+            self.__print(self.__names[reader], lines)
+
+    def close(self) -> None:
+        """
+        Prints whatever output is left without waiting for more, then closes
+        every reader.
+        """
+        ready = wait(self.readers, 0)
+        while ready:
+            self.read(ready)
+            ready = wait(self.readers, 0)
+
+        for reader in self.readers:
+            self.__close(reader)
+
+    def __close(self, reader: Connection) -> None:
+        name = self.__names.pop(reader)
+        buffer = self.__buffers.pop(reader)
+        if buffer:
+            self.__print(name, [buffer])
+        reader.close()
+
+    def __print(self, name: str, lines: Sequence[bytes]) -> None:
+        prefix = f"{datetime.now():%H:%M:%S} {name:<{self.__width}} | "
+        sys.stdout.write(
+            "".join(f"{prefix}{line.decode(errors='replace')}\n" for line in lines)
+        )
+        sys.stdout.flush()
+
+
+@click.command()
+@click.option(
+    "--spec",
+    type=click.File("r"),
+    required=True,
+    help="JSON list of the daemons to run, each as an object with a name, "
+    "the kind of command to run and its args. Use - to read it from stdin.",
+)
+def run_daemons(*, spec: TextIO) -> None:
+    """
+    Runs several Snuba daemons from a single interpreter.
+
+    Every daemon is started as a child of a preloaded forkserver. The first
+    one to exit causes all the remaining daemons to be terminated, and
+    killed if they are still running after a grace period, and its exit
+    code is used as the exit code of this command.
+    """
+    import multiprocessing
+    import signal
+    import time
+
+    daemons = json.load(spec)
+    for daemon in daemons:
+        get_command(daemon["kind"])
+
+    context = multiprocessing.get_context("forkserver")
+    context.set_forkserver_preload(FORKSERVER_PRELOAD)
+
+    output = _DaemonOutput(max((len(daemon["name"]) for daemon in daemons), default=0))
+
+    def handler(signum: int, frame: Any) -> None:
+        sys.exit(128 + signum)
+
+    signal.signal(signal.SIGINT, handler)
+    signal.signal(signal.SIGTERM, handler)
+
+    processes = []
+    try:
+        for daemon in daemons:
+            reader, writer = context.Pipe(duplex=False)
+            process = context.Process(
+                target=_run_daemon,
+                args=(daemon["kind"], daemon["args"], writer),
+                name=daemon["name"],
+            )
+            process.start()
+            processes.append(process)
+            # Only the daemon may keep the pipe open, so that its end can be
+            # seen once it exits.
+            writer.close()
+            output.add(daemon["name"], reader)
+
+        while True:
+            ready = wait([*output.readers, *(p.sentinel for p in processes)])
+            output.read(ready)
+            for process in processes:
+                if process.sentinel in ready:
+                    exitcode = process.exitcode
+                    assert exitcode is not None
+                    # A negative exit code means the daemon was killed by a
+                    # signal.
+                    sys.exit(exitcode if exitcode >= 0 else 128 - exitcode)
+    finally:
+        # A second Ctrl-C or SIGTERM must not interrupt the shutdown, the
+        # daemons are children of the forkserver and would be left running.
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        signal.signal(signal.SIGTERM, signal.SIG_IGN)
+
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+
+        # Keep printing the output of the daemons while they shut down, they
+        # could otherwise block writing to a full pipe.
+        deadline = time.monotonic() + SHUTDOWN_TIMEOUT
+        alive = [p.sentinel for p in processes if p.is_alive()]
+        while alive and time.monotonic() < deadline:
+            output.read(wait([*output.readers, *alive], deadline - time.monotonic()))
+            alive = [p.sentinel for p in processes if p.is_alive()]
+
+        for process in processes:
+            if process.is_alive():
+                process.kill()
+            process.join()
+
+        output.close()
@@ -22,6 +22,12 @@ class GroupedMessageEntity(Entity):
     def __init__(self) -> None:
         storage = get_cdc_storage(StorageKey.GROUPEDMESSAGES)
         schema = storage.get_table_writer().get_schema()
+        # The processors hold no per query state, so they are built once and
+        # shared by every query.
+        self.__query_processors: Sequence[QueryProcessor] = (
+            BasicFunctionsProcessor(),
+            ProjectRateLimiterProcessor("project_id"),
+        )
 
         super().__init__(
             storages=[storage],
@@ -43,10 +49,7 @@ class GroupedMessageEntity(Entity):
         )
 
     def get_query_processors(self) -> Sequence[QueryProcessor]:
-        return [
-            BasicFunctionsProcessor(),
-            ProjectRateLimiterProcessor("project_id"),
-        ]
+        return self.__query_processors
 
     def get_extensions(self) -> Mapping[str, QueryExtension]:
         return {}
@@ -3,7 +3,6 @@ from __future__ import annotations
 import copy
 import itertools
 import logging
-import math
 import random
 import time
 from concurrent.futures import Future, ThreadPoolExecutor, as_completed
@@ -287,13 +286,16 @@ class SubscriptionWorker(
 
 
 def handle_nan(result: Result) -> Result:
-    result_copy = copy.deepcopy(result)
-    for row in result_copy["data"]:
-        for key in row:
-            try:
-                if math.isnan(row[key]):
-                    row[key] = "nan"
-            except TypeError:
-                pass
+    # NaN is the only value that is not equal to itself, checking for it
+    # this way avoids calling ``math.isnan`` (and raising a ``TypeError``)
+    # for every value that is not a float.
+    result_copy = copy.copy(result)
+    result_copy["data"] = [
+        {
+            key: "nan" if isinstance(value, float) and value != value else value
+            for key, value in row.items()
+        }
+        for row in result["data"]
+    ]
 
     return result_copy
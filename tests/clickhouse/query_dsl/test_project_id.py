@@ -3,7 +3,7 @@ from typing import Any, MutableMapping, Set
 import pytest
 
 from snuba.clickhouse.query_dsl.accessors import get_object_ids_in_query_ast
-from snuba.datasets.factory import get_dataset
+from snuba.datasets.dataset import Dataset
 from snuba.datasets.plans.translator.query import identity_translate
 from snuba.query.parser import parse_query
 
@@ -135,9 +135,10 @@ test_cases = [
 
 @pytest.mark.parametrize("query_body, expected_projects", test_cases)
 def test_find_projects(
-    query_body: MutableMapping[str, Any], expected_projects: Set[int]
+    query_body: MutableMapping[str, Any],
+    expected_projects: Set[int],
+    events_dataset: Dataset,
 ) -> None:
-    events = get_dataset("events")
-    query = identity_translate(parse_query(query_body, events))
+    query = identity_translate(parse_query(query_body, events_dataset))
     project_ids_ast = get_object_ids_in_query_ast(query, "project_id")
     assert project_ids_ast == expected_projects
@@ -6,6 +6,8 @@ from snuba_sdk.legacy import json_to_snql
 
 from snuba import settings, state
 from snuba.clusters.cluster import ClickhouseClientSettings, ClickhouseCluster
+from snuba.datasets.dataset import Dataset
+from snuba.datasets.factory import get_dataset
 from snuba.datasets.schemas.tables import WritableTableSchema
 from snuba.datasets.storages.factory import STORAGES, get_storage
 from snuba.environment import setup_sentry
@@ -121,3 +123,8 @@ def disable_query_cache() -> Generator[None, None, None]:
     state.set_configs({"use_cache": 0, "use_readthrough_query_cache": 0})
     yield
     state.set_configs({"use_cache": cache, "use_readthrough_query_cache": readthrough})
+
+
+@pytest.fixture(scope="session")
+def events_dataset() -> Dataset:
+    return get_dataset("events")
@@ -2,8 +2,17 @@ import time
 from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
 from datetime import datetime, timedelta
-from typing import Any, Generator, Iterable, MutableMapping, Optional, Tuple
-from uuid import UUID, uuid1
+from typing import (
+    Any,
+    Generator,
+    Iterable,
+    MutableMapping,
+    MutableSequence,
+    Optional,
+    Sequence,
+    Tuple,
+)
+from uuid import UUID, uuid4
 
 import pytest
 from arroyo import Message, Partition, Topic
@@ -12,7 +21,7 @@ from arroyo.backends.local.storages.memory import MemoryMessageStorage
 from arroyo.utils.clock import TestingClock
 
 from snuba import state
-from snuba.datasets.factory import get_dataset
+from snuba.datasets.dataset import Dataset
 from snuba.query.conditions import ConditionFunctions, get_first_level_and_conditions
 from snuba.query.matchers import (
     Column,
@@ -22,6 +31,8 @@ from snuba.query.matchers import (
     Pattern,
     String,
 )
+from snuba.reader import Column as MetaColumn
+from snuba.reader import Result
 from snuba.subscriptions.consumer import Tick
 from snuba.subscriptions.data import (
     DelegateSubscriptionData,
@@ -43,22 +54,43 @@ from snuba.utils.metrics.backends.dummy import DummyMetricsBackend
 from snuba.utils.types import Interval
 from tests.backends.metrics import Increment, TestingMetricsBackend
 
+_GTE_STR = String(ConditionFunctions.GTE)
+_LT_STR = String(ConditionFunctions.LT)
+_TS_COLUMN = Column(None, String("timestamp"))
+
 
 class DummySubscriptionDataStore(SubscriptionDataStore):
     def __init__(self) -> None:
-        self.__subscriptions: MutableMapping[UUID, SubscriptionData] = {}
+        # Keys and data are kept in parallel lists so that ``all`` only scans
+        # two packed sequences, ``__index`` maps each key to its position.
+        self.__keys: MutableSequence[UUID] = []
+        self.__data: MutableSequence[SubscriptionData] = []
+        self.__index: MutableMapping[UUID, int] = {}
 
     def create(self, key: UUID, data: SubscriptionData) -> None:
-        self.__subscriptions[key] = data
+        if key in self.__index:
+            self.__data[self.__index[key]] = data
+            return
+
+        self.__index[key] = len(self.__keys)
+        self.__keys.append(key)
+        self.__data.append(data)
 
     def delete(self, key: UUID) -> None:
-        try:
-            del self.__subscriptions[key]
-        except KeyError:
-            pass
+        index = self.__index.pop(key, None)
+        if index is None:
+            return
+
+        # Move the last entry into the freed slot so both lists stay packed.
+        last_key = self.__keys.pop()
+        last_data = self.__data.pop()
+        if index < len(self.__keys):
+            self.__keys[index] = last_key
+            self.__data[index] = last_data
+            self.__index[last_key] = index
 
     def all(self) -> Iterable[Tuple[UUID, SubscriptionData]]:
-        return [*self.__subscriptions.items()]
+        return zip(self.__keys, self.__data)
 
 
 @dataclass(frozen=True)
@@ -73,9 +105,9 @@ class Datetime(Pattern[datetime]):
         return MatchResult() if node == self.value else None
 
 
-@pytest.fixture(
-    ids=["Legacy", "SnQL", "Delegate"],
-    params=[
+SUBSCRIPTION_DATA_VARIANTS: Sequence[Tuple[str, SubscriptionData]] = [
+    (
+        "Legacy",
         LegacySubscriptionData(
             project_id=1,
             conditions=[],
@@ -83,12 +115,18 @@ class Datetime(Pattern[datetime]):
             time_window=timedelta(minutes=60),
             resolution=timedelta(minutes=1),
         ),
+    ),
+    (
+        "SnQL",
         SnQLSubscriptionData(
             project_id=1,
             query=("MATCH (events) SELECT count() AS count"),
             time_window=timedelta(minutes=60),
             resolution=timedelta(minutes=1),
         ),
+    ),
+    (
+        "Delegate",
         DelegateSubscriptionData(
             project_id=1,
             conditions=[],
@@ -97,7 +135,13 @@ class Datetime(Pattern[datetime]):
             time_window=timedelta(minutes=60),
             resolution=timedelta(minutes=1),
         ),
-    ],
+    ),
+]
+
+
+@pytest.fixture(
+    ids=[variant for variant, _ in SUBSCRIPTION_DATA_VARIANTS],
+    params=[data for _, data in SUBSCRIPTION_DATA_VARIANTS],
 )
 def subscription_data(request: Any) -> SubscriptionData:
     assert isinstance(request.param, SubscriptionData)
@@ -111,7 +155,20 @@ def subscription_rollout() -> Generator[None, None, None]:
     state.set_config("snql_subscription_rollout", 0.0)
 
 
-def test_subscription_worker(subscription_data: SubscriptionData) -> None:
+@pytest.fixture
+def executor() -> Generator[ThreadPoolExecutor, None, None]:
+    # The tests only run a handful of evaluations, there is no need for a
+    # default sized pool.
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        yield executor
+
+
+def test_subscription_worker(
+    events_dataset: Dataset, executor: ThreadPoolExecutor
+) -> None:
+    # All the subscription data variants are run, one after the other,
+    # against the same broker and worker rather than each setting up their
+    # own.
     broker: Broker[SubscriptionTaskResult] = Broker(
         MemoryMessageStorage(), TestingClock()
     )
@@ -123,19 +180,13 @@ def test_subscription_worker(subscription_data: SubscriptionData) -> None:
     frequency = timedelta(minutes=1)
     evaluations = 3
 
-    subscription = Subscription(
-        SubscriptionIdentifier(PartitionId(0), uuid1()), subscription_data,
-    )
-
     store = DummySubscriptionDataStore()
-    store.create(subscription.identifier.uuid, subscription.data)
 
     metrics = DummyMetricsBackend(strict=True)
 
-    dataset = get_dataset("events")
     worker = SubscriptionWorker(
-        dataset,
-        ThreadPoolExecutor(),
+        events_dataset,
+        executor,
         {0: SubscriptionScheduler(store, PartitionId(0), timedelta(), metrics)},
         broker.get_producer(),
         result_topic,
@@ -149,62 +200,77 @@ def test_subscription_worker(subscription_data: SubscriptionData) -> None:
         timestamps=Interval(now - (frequency * evaluations), now),
     )
 
-    result_futures = worker.process_message(
-        Message(Partition(Topic("events"), 0), 0, tick, now)
-    )
-
-    assert result_futures is not None and len(result_futures) == evaluations
-
-    # Publish the results.
-    worker.flush_batch([result_futures])
-
     # Check to make sure the results were published.
     # NOTE: This does not cover the ``SubscriptionTaskResultCodec``!
     consumer = broker.get_consumer("group")
     consumer.subscribe([result_topic])
 
-    for i in range(evaluations):
-        timestamp = now - frequency * (evaluations - i)
-
-        message = consumer.poll()
-        assert message is not None
-        assert message.partition.topic == result_topic
-
-        task, future = result_futures[i]
-        future_result = request, result = future.result()
-        assert message.payload.task.timestamp == timestamp
-        assert message.payload == SubscriptionTaskResult(task, future_result)
-
-        # NOTE: The time series extension is folded back into the request
-        # body, ideally this would reference the timeseries options in
-        # isolation.
-        from_pattern = FunctionCall(
-            String(ConditionFunctions.GTE),
-            (
-                Column(None, String("timestamp")),
-                Literal(Datetime(timestamp - subscription.data.time_window)),
-            ),
+    timestamps = tuple(now - frequency * (evaluations - i) for i in range(evaluations))
+
+    for variant, subscription_data in SUBSCRIPTION_DATA_VARIANTS:
+        subscription = Subscription(
+            SubscriptionIdentifier(PartitionId(0), uuid4()), subscription_data,
         )
-        to_pattern = FunctionCall(
-            String(ConditionFunctions.LT),
-            (Column(None, String("timestamp")), Literal(Datetime(timestamp))),
+        store.create(subscription.identifier.uuid, subscription.data)
+
+        result_futures = worker.process_message(
+            Message(Partition(Topic("events"), 0), 0, tick, now)
         )
 
-        condition = request.query.get_condition()
-        assert condition is not None
+        assert (
+            result_futures is not None and len(result_futures) == evaluations
+        ), variant
+
+        # Publish the results.
+        worker.flush_batch([result_futures])
+
+        for i in range(evaluations):
+            timestamp = timestamps[i]
+
+            message = consumer.poll()
+            assert message is not None
+            assert message.partition.topic == result_topic
+
+            task, future = result_futures[i]
+            future_result = request, result = future.result()
+            assert message.payload.task.timestamp == timestamp
+            assert message.payload == SubscriptionTaskResult(task, future_result)
+
+            # NOTE: The time series extension is folded back into the request
+            # body, ideally this would reference the timeseries options in
+            # isolation.
+            from_pattern = FunctionCall(
+                _GTE_STR,
+                (
+                    _TS_COLUMN,
+                    Literal(Datetime(timestamp - subscription.data.time_window)),
+                ),
+            )
+            to_pattern = FunctionCall(
+                _LT_STR, (_TS_COLUMN, Literal(Datetime(timestamp))),
+            )
+
+            condition = request.query.get_condition()
+            assert condition is not None
 
-        conditions = get_first_level_and_conditions(condition)
+            conditions = get_first_level_and_conditions(condition)
 
-        assert any([from_pattern.match(e) for e in conditions])
-        assert any([to_pattern.match(e) for e in conditions])
+            assert any(from_pattern.match(e) for e in conditions), variant
+            assert any(to_pattern.match(e) for e in conditions), variant
 
-        assert result == {
-            "meta": [{"name": "count", "type": "UInt64"}],
-            "data": [{"count": 0}],
-        }
+            assert result == {
+                "meta": [{"name": "count", "type": "UInt64"}],
+                "data": [{"count": 0}],
+            }, variant
 
+        store.delete(subscription.identifier.uuid)
 
-def test_subscription_worker_consistent(subscription_data: SubscriptionData) -> None:
+
+def test_subscription_worker_consistent(
+    subscription_data: SubscriptionData,
+    events_dataset: Dataset,
+    executor: ThreadPoolExecutor,
+) -> None:
     state.set_config("event_subscription_non_consistent_sample_rate", 1)
     broker: Broker[SubscriptionTaskResult] = Broker(
         MemoryMessageStorage(), TestingClock()
@@ -218,7 +284,7 @@ def test_subscription_worker_consistent(subscription_data: SubscriptionData) ->
     evaluations = 1
 
     subscription = Subscription(
-        SubscriptionIdentifier(PartitionId(0), uuid1()), subscription_data,
+        SubscriptionIdentifier(PartitionId(0), uuid4()), subscription_data,
     )
 
     store = DummySubscriptionDataStore()
@@ -226,10 +292,9 @@ def test_subscription_worker_consistent(subscription_data: SubscriptionData) ->
 
     metrics = TestingMetricsBackend()
 
-    dataset = get_dataset("events")
     worker = SubscriptionWorker(
-        dataset,
-        ThreadPoolExecutor(),
+        events_dataset,
+        executor,
         {
             0: SubscriptionScheduler(
                 store, PartitionId(0), timedelta(), DummyMetricsBackend(strict=True)
@@ -249,7 +314,15 @@ def test_subscription_worker_consistent(subscription_data: SubscriptionData) ->
 
     worker.process_message(Message(Partition(Topic("events"), 0), 0, tick, now))
 
-    time.sleep(0.1)
+    # The metric is recorded asynchronously once the secondary query
+    # completes, so wait for it rather than sleeping for a fixed time.
+    deadline = time.monotonic() + 1.0
+    while time.monotonic() < deadline:
+        if any(
+            isinstance(m, Increment) and m.name == "consistent" for m in metrics.calls
+        ):
+            break
+        time.sleep(0.005)
 
     assert (
         len(
@@ -267,3 +340,36 @@ def test_handle_nan() -> None:
     assert handle_nan({"data": [{"a": float("nan"), "b": None}]}) == {
         "data": [{"a": "nan", "b": None}]
     }
+
+
+def test_handle_nan_keeps_other_values() -> None:
+    nan = float("nan")
+    row = {
+        "nan": nan,
+        "none": None,
+        "int": 1,
+        "str": "nan",
+        "float": 1.5,
+        "list": [1.5, 2],
+    }
+    meta: Sequence[MetaColumn] = [{"name": "nan", "type": "Float64"}]
+    result: Result = {"meta": meta, "data": [row]}
+
+    assert handle_nan(result) == {
+        "meta": meta,
+        "data": [
+            {
+                "nan": "nan",
+                "none": None,
+                "int": 1,
+                "str": "nan",
+                "float": 1.5,
+                "list": [1.5, 2],
+            }
+        ],
+    }
+
+    # The input result is left untouched.
+    assert result["meta"] is meta
+    assert result["data"] == [row] and result["data"][0] is row
+    assert row["nan"] is nan
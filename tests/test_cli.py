@@ -1,6 +1,23 @@
+import json
+import os
 import signal
 import subprocess
 import time
+from pathlib import Path
+from typing import Any, Sequence
+
+
+def _process_group_exists(pgid: int) -> bool:
+    try:
+        os.killpg(pgid, 0)
+    except ProcessLookupError:
+        return False
+    return True
+
+
+def _write_spec(path: Path, daemons: Sequence[Any]) -> str:
+    path.write_text(json.dumps(daemons))
+    return str(path)
 
 
 class TestCli(object):
@@ -15,3 +32,53 @@ class TestCli(object):
 
         proc.send_signal(signal.SIGINT)
         proc.wait()
+
+    def test_run_daemons_first_exit(self, tmp_path: Path) -> None:
+        """
+        Check that the first daemon to exit stops all the others and decides
+        the exit code of run-daemons
+        """
+        spec = _write_spec(
+            tmp_path / "spec.json",
+            [
+                {"name": "consumer", "kind": "consumer", "args": []},
+                # Exits with 1 straight away since --force is missing.
+                {"name": "bootstrap", "kind": "bootstrap", "args": []},
+            ],
+        )
+
+        # Run in its own process group so that the forkserver and every
+        # daemon forked from it can be found afterwards.
+        proc = subprocess.Popen(
+            ["snuba", "run-daemons", f"--spec={spec}"],
+            stdout=subprocess.PIPE,
+            start_new_session=True,
+        )
+        stdout, _ = proc.communicate(timeout=60)
+        assert proc.returncode == 1
+        # The exit code has to come from the bootstrap daemon, not from
+        # run-daemons failing on its own. Its output is labelled with its name.
+        assert b"bootstrap | Error: Must use --force to run\n" in stdout
+
+        deadline = time.monotonic() + 10
+        while _process_group_exists(proc.pid) and time.monotonic() < deadline:
+            time.sleep(0.1)
+
+        assert not _process_group_exists(proc.pid)
+
+    def test_run_daemons_unknown_kind(self, tmp_path: Path) -> None:
+        """
+        Check that an unknown daemon kind is rejected before anything starts
+        """
+        spec = _write_spec(
+            tmp_path / "spec.json",
+            [{"name": "unknown", "kind": "does-not-exist", "args": []}],
+        )
+
+        proc = subprocess.run(
+            ["snuba", "run-daemons", f"--spec={spec}"],
+            stderr=subprocess.PIPE,
+            timeout=60,
+        )
+        assert proc.returncode == 1
+        assert b"Unknown command 'does-not-exist'" in proc.stderr